@@ -0,0 +1,8 @@
+import os
+from pathlib import Path
+
+# Compute the project root once per process. Deployments may pin APP_ROOT in the
+# environment; otherwise it defaults to the directory above this package.
+# absolute() is a pure path operation, unlike resolve() which stats each component.
+os.environ.setdefault("APP_ROOT", str(Path(__file__).absolute().parents[1]))
+APP_ROOT = Path(os.environ["APP_ROOT"])
@@ -1,7 +1,24 @@
 import json
+import os
+import threading
 from pathlib import Path
 from typing import Any, Dict, Protocol
 
+import orjson
+
+# Pretty-printed drafts are only worth their extra bytes when a developer reads
+# them by hand; everywhere else write compact JSON.
+_DUMPS_OPTION = orjson.OPT_INDENT_2 if os.getenv("APP_ENV") == "dev" else 0
+
+
+def _dumps(data: Dict[str, Any]) -> bytes:
+    try:
+        return orjson.dumps(data, option=_DUMPS_OPTION)
+    except TypeError:
+        # orjson rejects integers beyond 64 bits, and drafts embed the client's
+        # payload as-is; the stdlib encoder writes any int.
+        return json.dumps(data, indent=2 if _DUMPS_OPTION else None).encode("utf-8")
+
 
 class ArtifactStore(Protocol):
     def write_json(self, relative_path: str, data: Dict[str, Any]) -> str:
@@ -16,6 +33,21 @@ class LocalArtifactStore:
 
     def write_json(self, relative_path: str, data: Dict[str, Any]) -> str:
         path = self.base_dir / relative_path
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        body = _dumps(data)
+        # Write to a sibling temp file, then rename over the target: readers never
+        # see a half-written artifact and a crash never leaves a truncated one.
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            try:
+                tmp_path.write_bytes(body)
+            except FileNotFoundError:
+                # Nested dirs are created on first use, and base_dir may have
+                # been removed since __init__: create the parent and retry once.
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_bytes(body)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Don't leave a stray temp file behind in the drafts dir.
+            tmp_path.unlink(missing_ok=True)
+            raise
         return str(path)
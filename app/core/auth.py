@@ -1,10 +1,26 @@
+import hmac
 import os
+
 from fastapi import Header, HTTPException
 
+# OPS_API_KEY as bytes, read at app startup by load_ops_api_key() (see the
+# lifespan in app.main). None means the server has no key configured.
+_ops_api_key: bytes | None = None
+
+
+def load_ops_api_key() -> None:
+    """
+    Read OPS_API_KEY from the environment. Called once at startup, so changing
+    the key (or setting it after startup) takes effect on the next restart.
+    """
+    global _ops_api_key
+    key = os.getenv("OPS_API_KEY")
+    _ops_api_key = key.encode("utf-8") if key else None
+
 
 def require_ops_api_key(x_api_key: str | None = Header(default=None, alias="X-API-Key")) -> None:
-    expected = os.getenv("OPS_API_KEY")
-    if not expected:
+    expected = _ops_api_key
+    if expected is None:
         raise HTTPException(status_code=500, detail="OPS_API_KEY not configured")
-    if x_api_key != expected:
+    if not hmac.compare_digest((x_api_key or "").encode("utf-8"), expected):
         raise HTTPException(status_code=403, detail="Forbidden")
@@ -0,0 +1,22 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# Event timestamps don't need sub-millisecond resolution: reuse one datetime
+# for calls within this window.
+_RESOLUTION_NS = 1_000_000
+
+# (monotonic ns when taken, value) stored as one tuple so concurrent callers
+# never see a torn pair.
+_cached: Tuple[int, Optional[datetime]] = (0, None)
+
+
+def now_utc() -> datetime:
+    """Timezone-aware current UTC time, at most ~1 ms stale."""
+    global _cached
+    mono = time.monotonic_ns()
+    taken, value = _cached
+    if value is None or mono - taken >= _RESOLUTION_NS:
+        value = datetime.now(timezone.utc)
+        _cached = (mono, value)
+    return value
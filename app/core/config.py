@@ -1,9 +1,23 @@
-import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict
 
+import orjson
+
+from app import APP_ROOT
+
+_CONFIG_PATH = APP_ROOT / "configs" / "routing.json"
+
+
+@lru_cache(maxsize=8)
+def _load_cached(path_str: str, mtime_ns: int) -> Dict[str, Any]:
+    # mtime_ns is part of the cache key only: editing the file invalidates the entry.
+    return orjson.loads(Path(path_str).read_bytes())
+
 
 def load_routing_config() -> Dict[str, Any]:
-    config_path = Path(__file__).resolve().parents[2] / "configs" / "routing.json"
-    with config_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    """
+    Return the parsed routing config.
+    The parsed dict is cached and shared between callers, so treat it as read-only.
+    """
+    return _load_cached(str(_CONFIG_PATH), _CONFIG_PATH.stat().st_mtime_ns)
@@ -1,14 +1,31 @@
-from typing import Dict
-from app.domain.schemas import Event
+import os
+import threading
+from collections import OrderedDict
+from app.core.idempotency_store import IdempotencyEntry
 
-# In-memory store for local development.
-# In production this becomes Redis or a DB table.
-_idempotency_store: Dict[str, Event] = {}
+# In-memory store of recently decided keys. app.main checks it before the
+# persistent SQLite store and only caches entries that carry a decision: those
+# never change, so a cached entry cannot go stale.
+# Bounded LRU so long-running processes don't grow without limit. Each entry
+# holds the client's payload (in the Event and again in the draft decision), and
+# payload size is not bounded, so keep the per-worker cap small.
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "4096"))
+_idempotency_store: "OrderedDict[str, IdempotencyEntry]" = OrderedDict()
+_lock = threading.Lock()
 
 
-def get_event(key: str) -> Event | None:
-    return _idempotency_store.get(key)
+def get_entry(key: str) -> IdempotencyEntry | None:
+    with _lock:
+        entry = _idempotency_store.get(key)
+        if entry is not None:
+            _idempotency_store.move_to_end(key)
+        return entry
 
 
-def set_event(key: str, event: Event) -> None:
-    _idempotency_store[key] = event
+def set_entry(key: str, entry: IdempotencyEntry) -> None:
+    with _lock:
+        _idempotency_store[key] = entry
+        _idempotency_store.move_to_end(key)
+        if len(_idempotency_store) > MAX_ENTRIES:
+            _idempotency_store.popitem(last=False)
+
@@ -1,38 +1,179 @@
-import json
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, NamedTuple, Optional, Tuple
 
-from app.domain.schemas import Event
+from app import APP_ROOT
+from app.domain.schemas import Decision, Event
 
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "idempotency.sqlite3"
+DB_PATH = APP_ROOT / "data" / "idempotency.sqlite3"
+
+# Kept as module constants so every call passes the identical SQL text and
+# hits the connection's prepared-statement cache.
+_SELECT_SQL = "SELECT event_json, decision_json FROM idempotency WHERE key = ?"
+# The first writer of a key wins: later inserts never replace its Event.
+_INSERT_SQL = (
+    "INSERT INTO idempotency (key, event_json, pending_until) VALUES (?, ?, ?) "
+    "ON CONFLICT(key) DO NOTHING"
+)
+# Takes over an undecided key whose previous claim was released or has expired.
+_RECLAIM_SQL = (
+    "UPDATE idempotency SET pending_until = ? WHERE key = ? AND decision_json IS NULL "
+    "AND (pending_until IS NULL OR pending_until <= ?) RETURNING event_json, decision_json"
+)
+_SET_DECISION_SQL = "UPDATE idempotency SET decision_json = ?, pending_until = NULL WHERE key = ?"
+_RELEASE_SQL = "UPDATE idempotency SET pending_until = NULL WHERE key = ?"
+
+# How long a claim holds a key against other workers. A worker that dies
+# mid-request never releases its claim; the key frees up once this passes.
+CLAIM_LEASE_SECONDS = 60.0
+
+
+class IdempotencyEntry(NamedTuple):
+    event: Event
+    # Set once the key has been fully processed; None for rows written before
+    # decisions were stored, or whose action failed (those get re-processed).
+    decision: Optional[Decision]
+
+
+class Claim(NamedTuple):
+    entry: IdempotencyEntry
+    # This call stored entry.event (the key had no row yet).
+    inserted: bool
+    # This call holds the key until set_decision() or release(); when False,
+    # the key is either decided already or held by another request/worker.
+    claimed: bool
 
 
 class SQLiteIdempotencyStore:
-    def __init__(self, db_path: Path = DB_PATH):
+    """
+    One writer connection (serialized by a lock) plus a small pool of reader
+    connections. In WAL mode readers never block the writer, so lookups scale
+    with the pool instead of queueing behind writes.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, readers: Optional[int] = None):
         self.db_path = db_path
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.db_path.parent.is_dir():
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
         self._init_db()
 
+        # A private ":memory:" database only exists on the connection that
+        # created it, so in that case reads go through the writer.
+        self._readers: Optional["queue.Queue[sqlite3.Connection]"] = None
+        if str(self.db_path) != ":memory:":
+            self._readers = queue.Queue()
+            for _ in range(readers or min(4, os.cpu_count() or 1)):
+                self._readers.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None, cached_statements=256
+        )
+        # Per-connection settings; journal_mode is persistent and set in _init_db.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=134217728")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        return conn
+
     def _init_db(self) -> None:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, event_json TEXT NOT NULL)"
-            )
-
-    def get(self, key: str) -> Optional[Event]:
-        with sqlite3.connect(self.db_path) as conn:
-            row = conn.execute("SELECT event_json FROM idempotency WHERE key = ?", (key,)).fetchone()
-        if not row:
-            return None
-        data = json.loads(row[0])
-        # Pydantic v2:
-        return Event.model_validate(data)
-
-    def set(self, key: str, event: Event) -> None:
-        event_json = json.dumps(event.model_dump(), default=str)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO idempotency (key, event_json) VALUES (?, ?)",
-                (key, event_json),
-            )
+        with self._write_lock:
+            self._writer.execute("PRAGMA journal_mode=WAL")
+            # Several workers may open the same database at once: take the write
+            # lock up front so only one of them creates/migrates the table, and
+            # the others see the finished schema.
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer.execute(
+                    "CREATE TABLE IF NOT EXISTS idempotency "
+                    "(key TEXT PRIMARY KEY, event_json TEXT NOT NULL, decision_json TEXT, "
+                    "pending_until REAL)"
+                )
+                # Databases created before these columns existed get them added.
+                columns = {row[1] for row in self._writer.execute("PRAGMA table_info(idempotency)")}
+                for column, sql_type in (("decision_json", "TEXT"), ("pending_until", "REAL")):
+                    if column not in columns:
+                        self._writer.execute(f"ALTER TABLE idempotency ADD COLUMN {column} {sql_type}")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        if self._readers is None:
+            with self._write_lock:
+                yield self._writer
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @staticmethod
+    def _entry_from_row(row: Tuple[str, Optional[str]]) -> IdempotencyEntry:
+        # Pydantic v2: parse + validate in pydantic-core, no intermediate dict.
+        event = Event.model_validate_json(row[0])
+        decision = Decision.model_validate_json(row[1]) if row[1] else None
+        return IdempotencyEntry(event, decision)
+
+    def get_entry(self, key: str) -> Optional[IdempotencyEntry]:
+        with self._reader() as conn:
+            row = conn.execute(_SELECT_SQL, (key,)).fetchone()
+        return self._entry_from_row(row) if row else None
+
+    def claim(self, key: str, event: Event, lease_seconds: float = CLAIM_LEASE_SECONDS) -> Claim:
+        """
+        Claim an undecided key for Decide/Act, storing `event` if the key has no
+        row yet. If another request (or worker) stored the key first, its Event
+        is returned and `event` is discarded. A decided key, or one still held
+        by an unexpired claim, is returned unclaimed. The stored entry comes
+        back in every case.
+        """
+        # pydantic-core serializes straight to JSON; no intermediate dict.
+        # None fields are dropped and restored as defaults by get_entry().
+        event_json = event.model_dump_json(exclude_none=True)
+        now = time.time()
+        pending_until = now + lease_seconds
+        with self._write_lock:
+            inserted = self._writer.execute(_INSERT_SQL, (key, event_json, pending_until)).rowcount == 1
+            if inserted:
+                return Claim(IdempotencyEntry(event, None), True, True)
+            # fetchall() steps the UPDATE to completion so its write ends here.
+            rows = self._writer.execute(_RECLAIM_SQL, (pending_until, key, now)).fetchall()
+            claimed = bool(rows)
+            # Decided, or held by another claim: read the row as it stands.
+            row = rows[0] if claimed else self._writer.execute(_SELECT_SQL, (key,)).fetchone()
+        return Claim(self._entry_from_row(row), False, claimed)
+
+    def set_decision(self, key: str, decision: Decision) -> None:
+        """Record the decision acted on for a claimed key and end the claim."""
+        decision_json = decision.model_dump_json(exclude_none=True)
+        with self._write_lock:
+            self._writer.execute(_SET_DECISION_SQL, (decision_json, key))
+
+    def release(self, key: str) -> None:
+        """End a claim without a decision, so the next retry can claim the key at once."""
+        with self._write_lock:
+            self._writer.execute(_RELEASE_SQL, (key,))
+
+    def close(self) -> None:
+        """Close every pooled connection. The store is unusable afterwards."""
+        with self._write_lock:
+            self._writer.close()
+        if self._readers is not None:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
@@ -0,0 +1,36 @@
+import os
+import threading
+import uuid
+
+# Random bytes for this many UUIDs are fetched with one os.urandom() call.
+_BATCH_SIZE = 1024
+
+_buf = b""
+_pos = 0
+_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # A forked child must not hand out the same ids as its parent. The lock is
+    # replaced too: if another thread held it at fork time, it stays held forever
+    # in the child.
+    global _buf, _pos, _lock
+    _buf, _pos = b"", 0
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def uuid4_str() -> str:
+    """
+    Same result as str(uuid.uuid4()), but the kernel RNG is read once per
+    _BATCH_SIZE ids instead of once per id.
+    """
+    global _buf, _pos
+    with _lock:
+        if _pos >= len(_buf):
+            _buf, _pos = os.urandom(16 * _BATCH_SIZE), 0
+        chunk = _buf[_pos:_pos + 16]
+        _pos += 16
+    return str(uuid.UUID(bytes=chunk, version=4))
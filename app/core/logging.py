@@ -1,11 +1,222 @@
-import json
+import atexit
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import Any, Dict
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from app import APP_ROOT
 
 # Log file path: <repo_root>/logs/events.jsonl
-LOG_FILE_PATH = Path(__file__).resolve().parents[2] / "logs" / "events.jsonl"
+LOG_FILE_PATH = APP_ROOT / "logs" / "events.jsonl"
+
+# Raw O_APPEND descriptor, opened on first use and kept open. Each batch of
+# whole lines goes straight to os.write(), so lines from concurrent writers
+# (other worker processes) never interleave. (st_dev, st_ino) of the open file:
+# once LOG_FILE_PATH names a different file (rotated or moved), it is reopened.
+_jsonl_fd: int | None = None
+_jsonl_file_id: Tuple[int, int] = (-1, -1)
+_jsonl_lock = threading.Lock()
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the last formatted timestamp.
+# Stored as one tuple so concurrent callers never see a torn pair.
+_ts_cache: Tuple[int, str] = (-1, "")
+
+# Records are handed to a background listener thread; JSON serialization and
+# console/file writes happen there instead of on the request path. Bounded so a
+# stalled sink cannot grow memory without limit.
+LOG_QUEUE_MAX_RECORDS = 10_000
+# Upper bound on records the listener drains before flushing the sinks.
+LOG_BATCH_MAX_RECORDS = 256
+_log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=LOG_QUEUE_MAX_RECORDS)
+_listener: "_EventLogListener | None" = None
+_listener_lock = threading.Lock()
+# Records discarded because the queue was full (see _DropOldestQueueHandler).
+_dropped_records = 0
+# Written once at shutdown if the queue overflowed (see stop_log_listener).
+EVT_LOG_RECORDS_DROPPED = "log_records_dropped"
+# Queued by stop() only to wake a listener blocked on an empty queue. The stop
+# request itself is an Event, so drop-oldest can never discard it.
+_WAKE = object()
+
+
+def _record_line(record: logging.LogRecord) -> bytes:
+    """
+    JSON line for a log_event record (dict passed via extra={"event_record": ...}).
+    Serialized once per record and reused by both sinks.
+    """
+    line = getattr(record, "_json_line", None)
+    if line is None:
+        event_record = getattr(record, "event_record", None)
+        if event_record is None:
+            line = record.getMessage().encode("utf-8")
+        else:
+            line = orjson.dumps(event_record, default=str)
+        record._json_line = line
+    return line
+
+
+class _JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return _record_line(record).decode("utf-8")
+
+
+class _JsonlFileHandler(logging.Handler):
+    """
+    Appends records as lines of the events file. Lines are buffered until
+    flush(), which the listener calls once per drained batch: one write() per
+    batch instead of one per record.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buf = bytearray()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._buf += _record_line(record)
+            self._buf += b"\n"
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self._buf:
+                return
+            try:
+                _append_jsonl(bytes(self._buf))
+            except OSError:
+                # Same policy as Handler.handleError: report, keep the listener alive.
+                if logging.raiseExceptions:
+                    traceback.print_exc()
+            finally:
+                self._buf.clear()
+
+
+class _DropOldestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Never blocks the caller: when the queue is full, the oldest queued record
+    is discarded to make room for the new one.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped_records
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    if self.queue.get_nowait() is not _WAKE:
+                        _dropped_records += 1
+                except queue.Empty:
+                    pass
+
+
+class _EventLogListener:
+    """
+    Drains the log queue on a daemon thread and runs the sinks: one blocking
+    get per batch, then whatever else is already queued (up to
+    LOG_BATCH_MAX_RECORDS), then a single flush of the file sink.
+    """
+
+    def __init__(self, q: "queue.Queue[Any]", *handlers: logging.Handler) -> None:
+        self.queue = q
+        self.handlers = handlers
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-log-listener", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Process everything already queued, then end the thread."""
+        self._stop.set()
+        try:
+            self.queue.put_nowait(_WAKE)
+        except queue.Full:
+            # The listener is busy draining; it sees the stop flag once empty.
+            pass
+        self._thread.join()
+
+    def _run(self) -> None:
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < LOG_BATCH_MAX_RECORDS:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is not _WAKE:
+                    self._handle(record)
+            # StreamHandler already flushes per record; only the file sink buffers.
+            for handler in self.handlers:
+                if isinstance(handler, _JsonlFileHandler):
+                    handler.flush()
+            if self._stop.is_set() and q.empty():
+                return
+
+    def _handle(self, record: logging.LogRecord) -> None:
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def dropped_log_records() -> int:
+    return _dropped_records
+
+
+def start_log_listener() -> None:
+    """Start the background sink thread (no-op if it is already running)."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        # Console handler (shows in terminal)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(_JsonLineFormatter())
+        _listener = _EventLogListener(_log_queue, console_handler, _JsonlFileHandler())
+        _listener.start()
+
+
+def stop_log_listener() -> None:
+    """
+    Flush everything still queued and stop the sink thread. If records were
+    dropped because the queue was full, a final record says how many.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        if _dropped_records:
+            event_record = {
+                "ts": _utc_now_iso(),
+                "event": EVT_LOG_RECORDS_DROPPED,
+                "count": _dropped_records,
+            }
+            # Blocking put: the listener is still draining, so there is room soon.
+            _log_queue.put(logging.makeLogRecord({
+                "name": "ai-control-plane",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": EVT_LOG_RECORDS_DROPPED,
+                "event_record": event_record,
+            }))
+        _listener.stop()
+        _listener = None
+        with _jsonl_lock:
+            _close_jsonl_locked()
+
+
+# Drain whatever is still queued before the process exits.
+atexit.register(stop_log_listener)
 
 
 def get_logger(name: str = "ai-control-plane") -> logging.Logger:
@@ -16,27 +227,78 @@ def get_logger(name: str = "ai-control-plane") -> logging.Logger:
 
     logger.setLevel(logging.INFO)
 
-    # Console handler (shows in terminal)
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter("%(message)s"))
-    logger.addHandler(console_handler)
+    # The logger itself only enqueues; the listener thread runs both sinks.
+    logger.addHandler(_DropOldestQueueHandler(_log_queue))
+    start_log_listener()
 
     return logger
 
 
-def log_event(logger: logging.Logger, event_name: str, fields: Dict[str, Any]) -> None:
-    record = {
-        "ts": datetime.utcnow().isoformat(),
-        "event": event_name,
-        **fields,
-    }
+def _utc_now_iso() -> str:
+    """
+    Same format as datetime.utcnow().isoformat(timespec="microseconds"),
+    but the date/time prefix is rebuilt only when the second changes.
+    """
+    global _ts_cache
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _ts_cache
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _ts_cache = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1_000_000):06d}"
+
+
+def _append_jsonl(data: bytes) -> None:
+    global _jsonl_fd, _jsonl_file_id
+    with _jsonl_lock:
+        if _jsonl_fd is not None:
+            # One stat per batch: after logrotate (or a manual mv/rm) the old fd
+            # points at an unlinked or renamed inode and every line would be lost.
+            try:
+                st = os.stat(LOG_FILE_PATH)
+                current = (st.st_dev, st.st_ino) == _jsonl_file_id
+            except FileNotFoundError:
+                current = False
+            if not current:
+                _close_jsonl_locked()
+        if _jsonl_fd is None:
+            LOG_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            _jsonl_fd = os.open(LOG_FILE_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            st = os.fstat(_jsonl_fd)
+            _jsonl_file_id = (st.st_dev, st.st_ino)
+        view = memoryview(data)
+        while view:
+            # os.write may write less than asked; finish the rest of the batch.
+            view = view[os.write(_jsonl_fd, view):]
+
+
+def _close_jsonl_locked() -> None:
+    global _jsonl_fd
+    if _jsonl_fd is not None:
+        os.close(_jsonl_fd)
+        _jsonl_fd = None
+
 
-    line = json.dumps(record, default=str)
+def log_event(
+    logger: logging.Logger,
+    event_name: str,
+    fields: Dict[str, Any],
+    base: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    `base` carries fields shared by every record of one request (built once by the
+    caller); `fields` holds the per-record ones and wins on key clashes.
+    """
+    # Both sinks follow the logger's level: skip all record building when INFO is off.
+    if not logger.isEnabledFor(logging.INFO):
+        return
 
-    # 1) Emit to terminal (stdout)
-    logger.info(line)
+    record: Dict[str, Any] = {"ts": _utc_now_iso(), "event": event_name}
+    if base:
+        record |= base
+    record |= fields
 
-    # 2) Persist to JSONL file for ops/reporting
-    LOG_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with LOG_FILE_PATH.open("a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    # One enqueue; the listener serializes the record, emits it to the terminal
+    # and persists it to the JSONL file for ops/reporting.
+    logger.info(event_name, extra={"event_record": record})
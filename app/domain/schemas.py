@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, ConfigDict, Field, SkipValidation
+from typing import Annotated, Any, Dict, Optional, List
 from datetime import datetime
 
 
@@ -38,13 +38,18 @@ class SlackIngestRequest(BaseModel):
 
 
 class Event(BaseModel):
+    # Events are immutable once created; they are stored and replayed as-is.
+    model_config = ConfigDict(frozen=True)
+
     event_id: str = Field(..., description="Unique idempotency anchor for this event")
     event_type: str
     source: str
     timestamp: datetime
     actor: Optional[str] = None
-    payload: Dict[str, Any]
-    metadata: Dict[str, Any]
+    # Already validated as IngestRequest at the HTTP boundary (or read back from
+    # our own store), so skip re-walking every key/value of the free-form dicts.
+    payload: Annotated[Dict[str, Any], SkipValidation] = Field(default_factory=dict)
+    metadata: Annotated[Dict[str, Any], SkipValidation]
 
 
 class Decision(BaseModel):
@@ -56,7 +61,7 @@ class Decision(BaseModel):
     )
     reason: str = Field(..., description="Human-readable reason for this decision")
     risk_level: str = Field("low", description="Risk level: low, medium, high")
-    proposed_action: Dict[str, Any] = Field(
+    proposed_action: Annotated[Dict[str, Any], SkipValidation] = Field(
         default_factory=dict,
         description="Optional structured action request",
     )
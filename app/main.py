@@ -1,23 +1,160 @@
-from datetime import datetime
-import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import logging
+from typing import Any, Dict
 
-from fastapi import FastAPI, Header, HTTPException, Depends
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from app.core.auth import require_ops_api_key
-from app.core.idempotency_store import SQLiteIdempotencyStore
-from app.core.logging import get_logger, log_event
-from app.domain.schemas import IngestRequest, IngestResponse, Event
+from app.core import idempotency as recent_events
+from app.core.auth import load_ops_api_key, require_ops_api_key
+from app.core.clock import now_utc
+from app.core.idgen import uuid4_str
+from app.core.idempotency_store import IdempotencyEntry, SQLiteIdempotencyStore
+from app.core.logging import get_logger, log_event, start_log_listener, stop_log_listener
+from app.domain.schemas import Decision, IngestRequest, IngestResponse, Event
 from app.services.router import route_event
-from app.services.actuator import execute_decision
+from app.services.actuator import STATUS_EXECUTED, execute_decision
 
-app = FastAPI(title="AI Control Plane")
-logger = get_logger()
+# Structured log event names (module constants: one shared str object per name)
+EVT_INGEST_REJECTED = "ingest_rejected"
+EVT_INGEST_CREATED = "ingest_created"
+EVT_INGEST_DUPLICATE = "ingest_duplicate"
+EVT_INGEST_IN_PROGRESS = "ingest_in_progress"
+EVT_DECISION_CREATED = "decision_created"
+EVT_ACTION_EXECUTED = "action_executed"
+EVT_ACTION_NOOP = "action_noop"
+EVT_ACTION_FAILED = "action_failed"
 
-# Persistent idempotency store (survives restarts)
-idem_store = SQLiteIdempotencyStore()
+# Action status -> log event name; any status not listed logs as a no-op.
+_ACTION_STATUS_TO_EVT = {STATUS_EXECUTED: EVT_ACTION_EXECUTED}
 
 
-def _process_ingest(ingest_req: IngestRequest, idempotency_key: str | None) -> IngestResponse:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Log sinks run on a background thread for the lifetime of the server;
+    # shutdown closes the pooled DB connections and flushes every queued record.
+    start_log_listener()
+    # The ops API key is read once here; restart to rotate it.
+    load_ops_api_key()
+    yield
+    # Background Act tasks (?async=true) keep their key in _in_flight until they
+    # have persisted; let them finish before closing the store they write to.
+    # A task still running after the grace period loses its write, and its
+    # claim lapses after CLAIM_LEASE_SECONDS so the key is retried.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_DRAIN_SECONDS
+    while _in_flight and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    # Only close the idempotency store if a request actually opened it.
+    if _idem_store.cache_info().currsize:
+        _idem_store().close()
+        _idem_store.cache_clear()
+    stop_log_listener()
+
+
+app = FastAPI(title="AI Control Plane", lifespan=lifespan)
+
+# Idempotency keys whose request is still being processed by this worker.
+# Only touched from _process_ingest on the event loop, so no lock is needed.
+# A per-process fast path: other workers are kept out by the store's claim.
+_in_flight: set[str] = set()
+
+# How long shutdown waits for in-flight requests and background Act tasks.
+SHUTDOWN_DRAIN_SECONDS = 10.0
+
+
+# Singletons are created on first use, not at import: importing the app opens
+# no DB connections and starts no log thread (safe with pre-fork servers).
+@lru_cache(maxsize=1)
+def _logger() -> logging.Logger:
+    return get_logger()
+
+
+@lru_cache(maxsize=1)
+def _idem_store() -> SQLiteIdempotencyStore:
+    # Persistent idempotency store (survives restarts)
+    return SQLiteIdempotencyStore()
+
+
+async def _act_and_persist(
+    event: Event,
+    decision: Decision,
+    idempotency_key: str,
+    *,
+    base_log: Dict[str, Any],
+) -> None:
+    """
+    Act on the decision, then record it on the key's stored entry.
+    Runs inline, or as a background task after the response for ?async=true.
+    """
+    logger = _logger()
+    idem_store = _idem_store()
+    log_info = logger.isEnabledFor(logging.INFO)
+
+    # Act (safe execution)
+    acted_decision = None
+    try:
+        action_result = await run_in_threadpool(execute_decision, event, decision)
+        if log_info:
+            log_event(
+                logger,
+                event_name=_ACTION_STATUS_TO_EVT.get(action_result.status, EVT_ACTION_NOOP),
+                fields={
+                    "action_id": action_result.action_id,
+                    "decision_id": action_result.decision_id,
+                    "action_type": action_result.action_type,
+                    "status": action_result.status,
+                    "artifact_path": action_result.artifact_path,
+                    "reason": action_result.reason,
+                },
+                base=base_log,
+            )
+        acted_decision = decision
+    except Exception as e:
+        if log_info:
+            log_event(
+                logger,
+                event_name=EVT_ACTION_FAILED,
+                fields={
+                    "decision_id": decision.decision_id,
+                    "route": decision.route,
+                    "error": str(e),
+                },
+                base=base_log,
+            )
+
+    # The Event was stored before Decide; add the Decision once acted on.
+    # If the action failed, only the Event is kept and a retry decides again:
+    # release the claim so that retry need not wait for it to expire.
+    if acted_decision is not None:
+        await run_in_threadpool(idem_store.set_decision, idempotency_key, acted_decision)
+        recent_events.set_entry(idempotency_key, IdempotencyEntry(event, acted_decision))
+    else:
+        await run_in_threadpool(idem_store.release, idempotency_key)
+
+
+def _in_progress_error(logger: logging.Logger, log_info: bool, idempotency_key: str) -> HTTPException:
+    if log_info:
+        log_event(
+            logger,
+            event_name=EVT_INGEST_IN_PROGRESS,
+            fields={"idempotency_key": idempotency_key},
+        )
+    return HTTPException(
+        status_code=409,
+        detail={"idempotency_key": idempotency_key, "status": "in_progress"},
+    )
+
+
+async def _process_ingest(
+    ingest_req: IngestRequest,
+    idempotency_key: str | None,
+    background: BackgroundTasks | None = None,
+) -> IngestResponse:
     """
     Canonical ingest pipeline runner:
       - enforce idempotency key
@@ -26,146 +163,128 @@ def _process_ingest(ingest_req: IngestRequest, idempotency_key: str | None) -> I
       - Act v0 (safe execution)
       - structured logging
       - returns {event, decision}
+    Runs on the event loop; only the blocking store/artifact calls go to the threadpool.
+    With `background`, Act (and persisting the key) is deferred until after the response.
     """
+    logger = _logger()
+    idem_store = _idem_store()
+    # Checked once: with INFO off, no log field dicts are built at all.
+    log_info = logger.isEnabledFor(logging.INFO)
+
     # Gate 1: Idempotency-Key is required
     if not idempotency_key:
-        log_event(
-            logger,
-            event_name="ingest_rejected",
-            fields={
-                "reason": "missing_idempotency_key",
-                "event_type": ingest_req.event_type,
-                "source": ingest_req.source,
-            },
-        )
+        if log_info:
+            log_event(
+                logger,
+                event_name=EVT_INGEST_REJECTED,
+                fields={
+                    "reason": "missing_idempotency_key",
+                    "event_type": ingest_req.event_type,
+                    "source": ingest_req.source,
+                },
+            )
         raise HTTPException(status_code=400, detail="Missing Idempotency-Key header")
 
-    # Gate 2: Reuse existing Event if this key was already processed (persistent)
-    existing_event = idem_store.get(idempotency_key)
-    if existing_event:
-        log_event(
-            logger,
-            event_name="ingest_duplicate",
-            fields={
-                "idempotency_key": idempotency_key,
-                "event_id": existing_event.event_id,
-                "event_type": existing_event.event_type,
-                "source": existing_event.source,
-            },
-        )
+    # Gate 2: a retry that arrives while the first request for this key is still
+    # running is told to back off instead of running Decide/Act a second time.
+    # This set only sees this worker; the store's claim (below) covers the others.
+    if idempotency_key in _in_flight:
+        raise _in_progress_error(logger, log_info, idempotency_key)
 
-        # Decide
-        decision = route_event(existing_event)
-        log_event(
-            logger,
-            event_name="decision_created",
-            fields={
-                "decision_id": decision.decision_id,
-                "event_id": decision.event_id,
-                "route": decision.route,
-                "risk_level": decision.risk_level,
-                "reason": decision.reason,
-            },
-        )
+    _in_flight.add(idempotency_key)
+    handed_off = False
+    try:
+        # Gate 3: Reuse existing Event if this key was already processed (persistent).
+        # Keys already decided are answered from the per-process LRU without a DB
+        # read. Undecided entries are never cached: another worker may decide the
+        # key at any time, and only the DB would show it.
+        # Otherwise the key is read on the WAL reader pool before any claim, so a
+        # decided duplicate never takes the database write lock all workers share.
+        entry = recent_events.get_entry(idempotency_key)
+        if entry is None:
+            entry = await run_in_threadpool(idem_store.get_entry, idempotency_key)
+            if entry is not None and entry.decision is not None:
+                recent_events.set_entry(idempotency_key, entry)
+        if entry is not None and entry.decision is not None:
+            is_duplicate = True
+        else:
+            # Claim the key before Decide/Act. A new key's Event is stored now, so
+            # a crash mid-Act still leaves the key bound to this event_id; if
+            # another worker stored the key first, its Event wins.
+            if entry is None:
+                # Create new canonical Event. Every field comes from the already
+                # validated IngestRequest, so skip re-validating it.
+                event = Event.model_construct(
+                    event_id=uuid4_str(),
+                    event_type=ingest_req.event_type,
+                    source=ingest_req.source,
+                    timestamp=now_utc(),
+                    actor=ingest_req.actor,
+                    payload=ingest_req.payload,
+                    metadata=ingest_req.metadata,
+                )
+            else:
+                event = entry.event
+            claim = await run_in_threadpool(idem_store.claim, idempotency_key, event)
+            entry = claim.entry
+            if not claim.claimed and entry.decision is None:
+                # Another worker is running Decide/Act for this key right now.
+                raise _in_progress_error(logger, log_info, idempotency_key)
+            is_duplicate = not claim.inserted
+        event = entry.event
 
-        # Act (safe execution)
-        try:
-            action_result = execute_decision(existing_event, decision)
+        base_log = {"idempotency_key": idempotency_key, "event_id": event.event_id}
+        if log_info:
             log_event(
                 logger,
-                event_name="action_executed" if action_result.status == "executed" else "action_noop",
+                event_name=EVT_INGEST_DUPLICATE if is_duplicate else EVT_INGEST_CREATED,
                 fields={
-                    "action_id": action_result.action_id,
-                    "event_id": action_result.event_id,
-                    "decision_id": action_result.decision_id,
-                    "action_type": action_result.action_type,
-                    "status": action_result.status,
-                    "artifact_path": action_result.artifact_path,
-                    "reason": action_result.reason,
+                    "event_type": event.event_type,
+                    "source": event.source,
                 },
+                base=base_log,
             )
-        except Exception as e:
+
+        if entry.decision is not None:
+            # Already decided and acted on: replay the stored decision instead of
+            # running Decide/Act again.
+            return IngestResponse.model_construct(event=event, decision=entry.decision)
+
+        # Decide
+        decision = route_event(event)
+        if log_info:
             log_event(
                 logger,
-                event_name="action_failed",
+                event_name=EVT_DECISION_CREATED,
                 fields={
-                    "event_id": existing_event.event_id,
                     "decision_id": decision.decision_id,
                     "route": decision.route,
-                    "error": str(e),
+                    "risk_level": decision.risk_level,
+                    "reason": decision.reason,
                 },
+                base=base_log,
             )
 
-        return IngestResponse(event=existing_event, decision=decision)
-
-    # Create new canonical Event
-    event = Event(
-        event_id=str(uuid.uuid4()),
-        event_type=ingest_req.event_type,
-        source=ingest_req.source,
-        timestamp=datetime.utcnow(),
-        actor=ingest_req.actor,
-        payload=ingest_req.payload,
-        metadata=ingest_req.metadata,
-    )
-
-    log_event(
-        logger,
-        event_name="ingest_created",
-        fields={
-            "idempotency_key": idempotency_key,
-            "event_id": event.event_id,
-            "event_type": event.event_type,
-            "source": event.source,
-        },
-    )
+        if background is not None:
+            # Respond right after Decide; Act + persist run once the response is
+            # sent. Until they finish the key stays claimed in the store and in
+            # flight here, so retries on any worker get 409; a failed Act
+            # releases the claim and the next retry decides again.
+            async def _finish() -> None:
+                try:
+                    await _act_and_persist(event, decision, idempotency_key, base_log=base_log)
+                finally:
+                    _in_flight.discard(idempotency_key)
 
-    # Persist Event for idempotency (survives restart)
-    idem_store.set(idempotency_key, event)
-
-    # Decide
-    decision = route_event(event)
-    log_event(
-        logger,
-        event_name="decision_created",
-        fields={
-            "decision_id": decision.decision_id,
-            "event_id": decision.event_id,
-            "route": decision.route,
-            "risk_level": decision.risk_level,
-            "reason": decision.reason,
-        },
-    )
-
-    # Act (safe execution)
-    try:
-        action_result = execute_decision(event, decision)
-        log_event(
-            logger,
-            event_name="action_executed" if action_result.status == "executed" else "action_noop",
-            fields={
-                "action_id": action_result.action_id,
-                "event_id": action_result.event_id,
-                "decision_id": action_result.decision_id,
-                "action_type": action_result.action_type,
-                "status": action_result.status,
-                "artifact_path": action_result.artifact_path,
-                "reason": action_result.reason,
-            },
-        )
-    except Exception as e:
-        log_event(
-            logger,
-            event_name="action_failed",
-            fields={
-                "event_id": event.event_id,
-                "decision_id": decision.decision_id,
-                "route": decision.route,
-                "error": str(e),
-            },
-        )
+            background.add_task(_finish)
+            handed_off = True
+        else:
+            await _act_and_persist(event, decision, idempotency_key, base_log=base_log)
 
-    return IngestResponse(event=event, decision=decision)
+        return IngestResponse.model_construct(event=event, decision=decision)
+    finally:
+        if not handed_off:
+            _in_flight.discard(idempotency_key)
 
 
 @app.get("/health")
@@ -182,9 +301,42 @@ def ops_ping(_: None = Depends(require_ops_api_key)):
     return {"status": "ok"}
 
 
-@app.post("/ingest/api", response_model=IngestResponse)
-def ingest_api(
-    req: IngestRequest,
+def _parse_ingest_request(body: bytes) -> IngestRequest:
+    """
+    Parse + validate the raw JSON body in one pydantic-core pass (no json.loads dict).
+    Errors are re-raised in FastAPI's usual 422 shape.
+    """
+    try:
+        return IngestRequest.model_validate_json(body)
+    except ValidationError as e:
+        errors = [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body)
+
+
+@app.post(
+    "/ingest/api",
+    response_model=IngestResponse,
+    # The body is read manually, so describe it for /docs explicitly.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": IngestRequest.model_json_schema()}},
+        }
+    },
+)
+async def ingest_api(
+    request: Request,
+    background_tasks: BackgroundTasks,
     idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+    run_async: bool = Query(
+        default=False,
+        alias="async",
+        description=(
+            "Respond after Decide and run Act in the background. Until Act has "
+            "finished, retries with the same key get 409; if Act failed, a retry "
+            "decides and acts again."
+        ),
+    ),
 ) -> IngestResponse:
-    return _process_ingest(req, idempotency_key)
+    req = _parse_ingest_request(await request.body())
+    return await _process_ingest(req, idempotency_key, background_tasks if run_async else None)
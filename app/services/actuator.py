@@ -1,12 +1,17 @@
-import uuid
-from pathlib import Path
 from typing import Any, Dict
 
+from app import APP_ROOT
 from app.core.artifacts import LocalArtifactStore
+from app.core.idgen import uuid4_str
 from app.domain.schemas import Event, Decision, ActionResult
+from app.services.router import ROUTE_CREATE_DRAFT_TICKET
+
+# ActionResult.status values
+STATUS_EXECUTED = "executed"
+STATUS_NOOP = "noop"
 
 # Default local artifact store (template-safe)
-DEFAULT_DRAFT_DIR = Path(__file__).resolve().parents[2] / "artifacts" / "drafts"
+DEFAULT_DRAFT_DIR = APP_ROOT / "artifacts" / "drafts"
 artifact_store = LocalArtifactStore(DEFAULT_DRAFT_DIR)
 
 
@@ -18,9 +23,9 @@ def execute_decision(event: Event, decision: Decision) -> ActionResult:
 
     No external side effects.
     """
-    action_id = str(uuid.uuid4())
+    action_id = uuid4_str()
 
-    if decision.route == "CREATE_DRAFT_TICKET":
+    if decision.route == ROUTE_CREATE_DRAFT_TICKET:
         relative_path = f"{event.event_id}.draft_ticket.json"
 
         draft_payload: Dict[str, Any] = {
@@ -39,7 +44,7 @@ def execute_decision(event: Event, decision: Decision) -> ActionResult:
             event_id=event.event_id,
             decision_id=decision.decision_id,
             action_type="create_ticket_draft",
-            status="executed",
+            status=STATUS_EXECUTED,
             artifact_path=artifact_path,
             reason="Draft ticket artifact written",
         )
@@ -49,7 +54,7 @@ def execute_decision(event: Event, decision: Decision) -> ActionResult:
         event_id=event.event_id,
         decision_id=decision.decision_id,
         action_type="noop",
-        status="noop",
+        status=STATUS_NOOP,
         artifact_path=None,
         reason=f"No action executed for route: {decision.route}",
     )
@@ -1,20 +1,27 @@
-import uuid
-from typing import Any
+import re
 
+from app.core.idgen import uuid4_str
 from app.domain.schemas import Event, Decision
 
+# Decision.route values
+ROUTE_ESCALATE_HUMAN = "ESCALATE_HUMAN"
+ROUTE_REQUEST_MORE_INFO = "REQUEST_MORE_INFO"
+ROUTE_CREATE_DRAFT_TICKET = "CREATE_DRAFT_TICKET"
+
+# Rule 1 keywords, compiled once into a single case-insensitive alternation so
+# the text is scanned in one pass, without a lower-cased copy.
+SECURITY_KEYWORDS = ("password", "credential", "security", "breach")
+_SECURITY_RE = re.compile("|".join(map(re.escape, SECURITY_KEYWORDS)), re.IGNORECASE)
+
 
 def _get_text(event: Event) -> str:
     """
     Extract a best-effort text field from the event payload.
-    We keep this defensive because payloads vary across sources/domains.
+    The payload is always a dict (validated at the HTTP boundary), but its
+    "text" value varies across sources/domains, so only that is checked.
     """
-    payload: Any = event.payload or {}
-    if isinstance(payload, dict):
-        text = payload.get("text")
-        if isinstance(text, str):
-            return text
-    return ""
+    text = event.payload.get("text")
+    return text if isinstance(text, str) else ""
 
 
 def route_event(event: Event) -> Decision:
@@ -28,31 +35,28 @@ def route_event(event: Event) -> Decision:
 
     This function performs NO side effects. It returns a reviewable plan only.
     """
-    decision_id = str(uuid.uuid4())
-    text = _get_text(event).lower()
+    decision_id = uuid4_str()
+    text = _get_text(event)
 
     # Rule 1: High-risk / security keywords -> escalate
-    security_keywords = ["password", "credential", "security", "breach"]
-    if any(k in text for k in security_keywords):
+    if _SECURITY_RE.search(text):
         return Decision(
             decision_id=decision_id,
             event_id=event.event_id,
-            route="ESCALATE_HUMAN",
+            route=ROUTE_ESCALATE_HUMAN,
             reason="Security-related keyword detected",
             risk_level="high",
             proposed_action={},
         )
 
     # Rule 2: Missing required info -> request more info
-    urgency = None
-    if isinstance(event.payload, dict):
-        urgency = event.payload.get("urgency")
+    urgency = event.payload.get("urgency")
 
     if not urgency:
         return Decision(
             decision_id=decision_id,
             event_id=event.event_id,
-            route="REQUEST_MORE_INFO",
+            route=ROUTE_REQUEST_MORE_INFO,
             reason="Missing required field: urgency",
             risk_level="medium",
             proposed_action={
@@ -62,14 +66,13 @@ def route_event(event: Event) -> Decision:
         )
 
     # Rule 3: Default -> create a draft ticket (still reversible / reviewable)
-    summary = "Support request"
-    if text:
-        summary = text[:80]  # keep short and safe
+    # Summary keeps the original casing so it reads naturally in the ticket.
+    summary = text[:80] if text else "Support request"  # keep short and safe
 
     return Decision(
         decision_id=decision_id,
         event_id=event.event_id,
-        route="CREATE_DRAFT_TICKET",
+        route=ROUTE_CREATE_DRAFT_TICKET,
         reason="Standard support request",
         risk_level="low",
         proposed_action={
@@ -77,6 +80,6 @@ def route_event(event: Event) -> Decision:
             "queue": "IT",
             "priority": str(urgency).lower(),
             "summary": summary,
-            "description": (event.payload if isinstance(event.payload, dict) else {"text": text}),
+            "description": event.payload,
         },
     )
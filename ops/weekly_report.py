@@ -1,57 +1,82 @@
-import json
+import os
 from collections import Counter
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, Tuple
 
-LOG_PATH = Path(__file__).resolve().parents[1] / "logs" / "events.jsonl"
+import orjson
 
+# Same root as app.APP_ROOT (APP_ROOT env var, else the repo root), looked up
+# here because the script runs as `python ops/weekly_report.py`, where the
+# app package is not importable.
+APP_ROOT = Path(os.environ.get("APP_ROOT") or Path(__file__).absolute().parents[1])
+LOG_PATH = APP_ROOT / "logs" / "events.jsonl"
 
-def read_jsonl(path: Path) -> Iterable[Dict[str, Any]]:
+
+def read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one record per line. Streams the file so memory stays flat however
+    large the log grows.
+    """
     if not path.exists():
-        return []
-    records: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
+        return
+    # orjson parses bytes directly; no text decoding pass.
+    with path.open("rb", buffering=1024 * 1024) as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                records.append(json.loads(line))
-            except json.JSONDecodeError:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
                 # Skip malformed lines rather than crashing ops reporting
                 continue
-    return records
-
 
-def main() -> None:
-    records = list(read_jsonl(LOG_PATH))
 
-    if not records:
-        print("No log records found yet.")
-        print(f"Expected log file at: {LOG_PATH}")
-        print("Generate some traffic via /docs, then rerun this report.")
-        return
+_TOTAL = ("total", "")
 
-    event_counts = Counter()
-    route_counts = Counter()
-    reason_counts = Counter()
 
+def _report_keys(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, str]]:
+    """
+    Flatten records into (counter, key) pairs so a single Counter() call does
+    all the tallying in its C loop.
+    """
     for r in records:
+        yield _TOTAL
         event_name = r.get("event")
-        if event_name:
-            event_counts[event_name] += 1
+        if not event_name:
+            continue
+        yield ("event", event_name)
 
         if event_name == "decision_created":
             route = r.get("route")
             reason = r.get("reason")
             if route:
-                route_counts[str(route)] += 1
+                yield ("route", str(route))
             if reason:
-                reason_counts[str(reason)] += 1
+                yield ("reason", str(reason))
+
+
+def main() -> None:
+    counts = Counter(_report_keys(read_jsonl(LOG_PATH)))
+    total_records = counts[_TOTAL]
+
+    event_counts = Counter()
+    route_counts = Counter()
+    reason_counts = Counter()
+    by_kind = {"event": event_counts, "route": route_counts, "reason": reason_counts}
+    for (kind, key), n in counts.items():
+        if kind in by_kind:
+            by_kind[kind][key] = n
+
+    if not total_records:
+        print("No log records found yet.")
+        print(f"Expected log file at: {LOG_PATH}")
+        print("Generate some traffic via /docs, then rerun this report.")
+        return
 
     print("=== AI Control Plane Ops Report ===")
     print(f"Log file: {LOG_PATH}")
-    print(f"Total records: {len(records)}")
+    print(f"Total records: {total_records}")
     print()
 
     print("---- Ingest / Decision Event Counts ----")
@@ -5,3 +5,81 @@ import sys
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
+
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _isolated_outputs(tmp_path_factory):
+    """
+    Send the event log and draft artifacts to a temp dir for the whole session,
+    so test runs never write into the repo's logs/ or artifacts/.
+    """
+    import app.core.logging as app_logging
+    import app.services.actuator as actuator
+    from app.core.artifacts import LocalArtifactStore
+
+    out = tmp_path_factory.mktemp("outputs")
+    mp = pytest.MonkeyPatch()
+    mp.setattr(app_logging, "LOG_FILE_PATH", out / "events.jsonl")
+    mp.setattr(actuator, "artifact_store", LocalArtifactStore(out / "drafts"))
+    yield out
+    # Drain queued records into the temp log before the real path comes back.
+    app_logging.stop_log_listener()
+    mp.undo()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient (and one app startup/shutdown) shared by the whole session."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def idem_store(monkeypatch):
+    """
+    Fresh in-memory idempotency store (and empty per-process cache) per test.
+    Duplicates replay their stored decision without re-acting, so keys must not
+    carry over from earlier runs through data/idempotency.sqlite3.
+    """
+    import app.main as main
+    from app.core import idempotency as recent_events
+    from app.core.idempotency_store import SQLiteIdempotencyStore
+
+    store = SQLiteIdempotencyStore(Path(":memory:"))
+    monkeypatch.setattr(main, "_idem_store", lambda: store)
+    monkeypatch.setattr(recent_events, "_idempotency_store", OrderedDict())
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def make_ingest_payload():
+    """
+    Build an /ingest/api request body. Defaults to a complete support request;
+    pass urgency=None to leave it out, or override any top-level field.
+    """
+
+    def _make(text="VPN is down", urgency="high", **overrides):
+        inner = {"text": text}
+        if urgency is not None:
+            inner["urgency"] = urgency
+        body = {
+            "event_type": "support_request",
+            "source": "api",
+            "actor": "test_user",
+            "payload": inner,
+            "metadata": {},
+        }
+        body.update(overrides)
+        return body
+
+    return _make
@@ -1,102 +1,195 @@
-import json
-from pathlib import Path
+import asyncio
 
-from fastapi.testclient import TestClient
+import orjson
+import pytest
 
-from app.main import app
+import app.main as main
 import app.services.actuator as actuator
 from app.core.artifacts import LocalArtifactStore
+from app.core.config import load_routing_config
+from app.domain.schemas import IngestRequest, IngestResponse
 
-client = TestClient(app)
 
+class FakeArtifactStore:
+    """In-memory ArtifactStore: records each write instead of touching disk."""
 
-def test_create_draft_ticket_writes_artifact(tmp_path, monkeypatch):
-    """
-    If routing returns CREATE_DRAFT_TICKET, Act v0 must write a draft artifact.
-    We redirect draft output to tmp_path so tests don't touch real artifacts/.
-    """
-    draft_dir = tmp_path / "drafts"
-    monkeypatch.setattr(actuator, "artifact_store", LocalArtifactStore(draft_dir))
+    def __init__(self) -> None:
+        self.writes: list[tuple[str, dict]] = []
 
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "VPN is down", "urgency": "high"},
-        "metadata": {"channel": "pytest"},
-    }
+    def write_json(self, relative_path: str, data: dict) -> str:
+        self.writes.append((relative_path, data))
+        return relative_path
 
-    headers = {"Idempotency-Key": "act-draft-1"}
 
-    resp = client.post("/ingest/api", json=payload, headers=headers)
-    assert resp.status_code == 200
+@pytest.fixture
+def fake_store(monkeypatch) -> FakeArtifactStore:
+    store = FakeArtifactStore()
+    monkeypatch.setattr(actuator, "artifact_store", store)
+    return store
 
-    body = resp.json()
-    event_id = body["event"]["event_id"]
-    decision_id = body["decision"]["decision_id"]
-    route = body["decision"]["route"]
 
-    assert route == "CREATE_DRAFT_TICKET"
+def _ingest(payload: dict, idempotency_key: str) -> IngestResponse:
+    # These tests are about Decide/Act, not HTTP: run the pipeline directly.
+    return asyncio.run(main._process_ingest(IngestRequest.model_validate(payload), idempotency_key))
+
+
+@pytest.mark.parametrize(
+    "overrides,expected_route,expect_artifact",
+    [
+        ({"metadata": {"channel": "pytest"}}, "CREATE_DRAFT_TICKET", True),
+        ({"text": "We have a security breach"}, "ESCALATE_HUMAN", False),
+        ({"urgency": None}, "REQUEST_MORE_INFO", False),
+    ],
+    ids=["draft", "escalate", "more-info"],
+)
+def test_routing_and_artifact(
+    fake_store, make_ingest_payload, overrides, expected_route, expect_artifact
+):
+    """
+    Only CREATE_DRAFT_TICKET makes Act v0 write a draft artifact.
+    Drafts go to an in-memory store so tests don't touch real artifacts/.
+    """
+    payload = make_ingest_payload(**overrides)
+
+    result = _ingest(payload, f"act-{expected_route.lower()}-1")
+
+    assert result.decision.route == expected_route
 
-    artifact_path = draft_dir / f"{event_id}.draft_ticket.json"
-    assert artifact_path.exists()
+    if not expect_artifact:
+        # No artifact should exist
+        assert fake_store.writes == []
+        return
+
+    event_id = result.event.event_id
+    [(relative_path, artifact)] = fake_store.writes
+    assert relative_path == f"{event_id}.draft_ticket.json"
 
-    artifact = json.loads(artifact_path.read_text(encoding="utf-8"))
     assert artifact["event_id"] == event_id
-    assert artifact["decision_id"] == decision_id
+    assert artifact["decision_id"] == result.decision.decision_id
     assert artifact["route"] == "CREATE_DRAFT_TICKET"
     assert "proposed_action" in artifact
 
 
-def test_escalation_does_not_write_artifact(tmp_path, monkeypatch):
+def test_draft_with_oversized_int_in_payload(idem_store, tmp_path, monkeypatch, make_ingest_payload):
     """
-    ESCALATE_HUMAN must not produce any draft artifacts.
+    orjson cannot encode ints beyond 64 bits; a draft carrying one must still be
+    written (and the key decided) instead of failing Act on every retry.
     """
-    draft_dir = tmp_path / "drafts"
-    monkeypatch.setattr(actuator, "artifact_store", LocalArtifactStore(draft_dir))
+    monkeypatch.setattr(actuator, "artifact_store", LocalArtifactStore(tmp_path))
+    big = 123456789012345678901234567890
+    payload = make_ingest_payload()
+    payload["payload"]["n"] = big
+
+    result = _ingest(payload, "act-bigint-1")
+
+    assert idem_store.get_entry("act-bigint-1").decision == result.decision
+    draft = tmp_path / f"{result.event.event_id}.draft_ticket.json"
+    # orjson parses big ints back only as floats; compare the raw text instead
+    assert str(big).encode() in draft.read_bytes()
+    assert orjson.loads(draft.read_bytes())["route"] == "CREATE_DRAFT_TICKET"
 
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "We have a security breach", "urgency": "high"},
-        "metadata": {},
-    }
 
-    headers = {"Idempotency-Key": "act-escalate-1"}
+def test_async_ingest_runs_act_in_background(client, fake_store, make_ingest_payload):
+    """
+    With ?async=true the response is sent after Decide; Act still writes the
+    draft (TestClient runs background tasks before returning).
+    """
+    payload = make_ingest_payload()
+
+    headers = {"Idempotency-Key": "act-draft-async-1"}
 
-    resp = client.post("/ingest/api", json=payload, headers=headers)
+    resp = client.post("/ingest/api", json=payload, headers=headers, params={"async": "true"})
     assert resp.status_code == 200
 
-    decision = resp.json()["decision"]
-    assert decision["route"] == "ESCALATE_HUMAN"
+    body = resp.json()
+    assert body["decision"]["route"] == "CREATE_DRAFT_TICKET"
+    assert [path for path, _ in fake_store.writes] == [f"{body['event']['event_id']}.draft_ticket.json"]
+
 
-    # No artifact should exist
-    assert not draft_dir.exists() or not any(draft_dir.iterdir())
+def test_async_act_failure_leaves_key_retryable(
+    client, idem_store, fake_store, monkeypatch, make_ingest_payload
+):
+    """
+    With ?async=true the client already has the decision when Act fails: the
+    key must stay undecided so a retry acts, rather than replaying a decision
+    that was never carried out.
+    """
+    real_execute = main.execute_decision
 
+    def _fail_once(event, decision):
+        monkeypatch.setattr(main, "execute_decision", real_execute)
+        raise RuntimeError("artifact store unavailable")
 
-def test_request_more_info_does_not_write_artifact(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "execute_decision", _fail_once)
+
+    payload = make_ingest_payload()
+    headers = {"Idempotency-Key": "act-async-retry-1"}
+
+    r1 = client.post("/ingest/api", json=payload, headers=headers, params={"async": "true"})
+    assert r1.status_code == 200
+    assert idem_store.get_entry("act-async-retry-1").decision is None
+    assert fake_store.writes == []
+
+    r2 = client.post("/ingest/api", json=payload, headers=headers, params={"async": "true"})
+    assert r2.status_code == 200
+    assert r2.json()["event"]["event_id"] == r1.json()["event"]["event_id"]
+    assert len(fake_store.writes) == 1
+    assert idem_store.get_entry("act-async-retry-1").decision is not None
+
+
+def test_failed_act_keeps_event_for_retry(idem_store, fake_store, monkeypatch, make_ingest_payload):
     """
-    REQUEST_MORE_INFO must not produce any draft artifacts.
+    The Event is stored before Act: a retry after a failed action reuses its
+    event_id and acts again, instead of minting a new event and draft.
     """
-    draft_dir = tmp_path / "drafts"
-    monkeypatch.setattr(actuator, "artifact_store", LocalArtifactStore(draft_dir))
+    real_execute = main.execute_decision
 
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "VPN is down"},
-        "metadata": {},
-    }
+    def _fail_once(event, decision):
+        monkeypatch.setattr(main, "execute_decision", real_execute)
+        raise RuntimeError("artifact store unavailable")
 
-    headers = {"Idempotency-Key": "act-clarify-1"}
+    monkeypatch.setattr(main, "execute_decision", _fail_once)
 
-    resp = client.post("/ingest/api", json=payload, headers=headers)
-    assert resp.status_code == 200
+    payload = make_ingest_payload()
+
+    first = _ingest(payload, "act-retry-1")
+    assert fake_store.writes == []
+    assert idem_store.get_entry("act-retry-1").decision is None
+
+    second = _ingest(payload, "act-retry-1")
+    assert second.event.event_id == first.event.event_id
+    assert len(fake_store.writes) == 1
+    assert idem_store.get_entry("act-retry-1").decision == second.decision
 
-    decision = resp.json()["decision"]
-    assert decision["route"] == "REQUEST_MORE_INFO"
 
-    # No artifact should exist
-    assert not draft_dir.exists() or not any(draft_dir.iterdir())
+def test_undecided_entry_is_not_cached(idem_store, fake_store, monkeypatch, make_ingest_payload):
+    """
+    A key seen without a decision must be re-read from the DB: once another
+    worker decides it, this worker replays that decision instead of acting.
+    """
+
+    def _fail(event, decision):
+        raise RuntimeError("artifact store unavailable")
+
+    monkeypatch.setattr(main, "execute_decision", _fail)
+    payload = make_ingest_payload()
+    _ingest(payload, "act-stale-1")
+    first = _ingest(payload, "act-stale-1")
+
+    # Another worker acts on the key and records its decision.
+    idem_store.set_decision("act-stale-1", first.decision)
+
+    replayed = _ingest(payload, "act-stale-1")
+    assert replayed.decision == first.decision
+    assert fake_store.writes == []
+
+
+def test_routing_config_is_parsed_once():
+    """
+    Repeated loads of an unchanged routing.json must return the cached parse.
+    """
+    first = load_routing_config()
+    second = load_routing_config()
+
+    assert first is second
+    assert "security_keywords" in first
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from app.core.artifacts import LocalArtifactStore
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    store = LocalArtifactStore(tmp_path / "drafts")
+
+    def _fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", _fail)
+
+    with pytest.raises(OSError):
+        store.write_json("evt-1.draft_ticket.json", {"event_id": "evt-1"})
+
+    assert list((tmp_path / "drafts").iterdir()) == []
+
+
+def test_write_recreates_removed_base_dir(tmp_path):
+    base_dir = tmp_path / "drafts"
+    store = LocalArtifactStore(base_dir)
+    base_dir.rmdir()
+
+    path = store.write_json("nested/evt-2.draft_ticket.json", {"event_id": "evt-2"})
+
+    assert path == str(base_dir / "nested" / "evt-2.draft_ticket.json")
+    assert os.path.exists(path)
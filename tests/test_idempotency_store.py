@@ -0,0 +1,36 @@
+import multiprocessing
+import sqlite3
+
+from app.core.idempotency_store import SQLiteIdempotencyStore
+
+
+def _make_old_schema_db(path) -> None:
+    # The original two-column table, as shipped before decisions were stored.
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE idempotency (key TEXT PRIMARY KEY, event_json TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+
+
+def _open_store(path) -> None:
+    SQLiteIdempotencyStore(path).close()
+
+
+def test_concurrent_opens_migrate_old_schema_once(tmp_path):
+    """Workers opening an old database at the same time must not race the ALTERs."""
+    ctx = multiprocessing.get_context("fork")
+    for i in range(5):
+        db_path = tmp_path / f"idem-{i}.sqlite3"
+        _make_old_schema_db(db_path)
+
+        procs = [ctx.Process(target=_open_store, args=(db_path,)) for _ in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+        assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+        conn = sqlite3.connect(db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(idempotency)")]
+        conn.close()
+        assert columns == ["key", "event_json", "decision_json", "pending_until"]
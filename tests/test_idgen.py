@@ -0,0 +1,43 @@
+import os
+import select
+import signal
+import threading
+
+from app.core import idgen
+
+
+def test_child_after_fork_gets_fresh_ids_even_if_lock_was_held():
+    parent_id = idgen.uuid4_str()
+    r, w = os.pipe()
+    # Another thread holds the lock at fork time.
+    locked, release = threading.Event(), threading.Event()
+
+    def _hold_lock():
+        with idgen._lock:
+            locked.set()
+            release.wait()
+
+    holder = threading.Thread(target=_hold_lock)
+    holder.start()
+    locked.wait()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(w, idgen.uuid4_str().encode())
+        finally:
+            os._exit(0)
+    release.set()
+    holder.join()
+    os.close(w)
+    ready, _, _ = select.select([r], [], [], 5.0)
+    if not ready:
+        # The child is stuck on the inherited lock
+        os.kill(pid, signal.SIGKILL)
+    child_id = os.read(r, 64).decode() if ready else ""
+    os.close(r)
+    os.waitpid(pid, 0)
+
+    assert child_id
+    assert child_id != parent_id
+    # The parent's pool continues where it left off, not with the child's id.
+    assert idgen.uuid4_str() != child_id
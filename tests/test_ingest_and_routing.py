@@ -1,18 +1,11 @@
-from fastapi.testclient import TestClient
+import asyncio
 
-from app.main import app
+from app.domain.schemas import Event, IngestRequest
+import app.main as main
 
-client = TestClient(app)
 
-
-def test_ingest_requires_idempotency_key():
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "VPN is down", "urgency": "high"},
-        "metadata": {},
-    }
+def test_ingest_requires_idempotency_key(client, make_ingest_payload):
+    payload = make_ingest_payload()
 
     response = client.post("/ingest/api", json=payload)
 
@@ -20,14 +13,8 @@ def test_ingest_requires_idempotency_key():
     assert response.json()["detail"] == "Missing Idempotency-Key header"
 
 
-def test_security_keyword_routes_to_escalation():
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "There was a security breach", "urgency": "high"},
-        "metadata": {},
-    }
+def test_security_keyword_routes_to_escalation(client, make_ingest_payload):
+    payload = make_ingest_payload(text="There was a security breach")
 
     headers = {"Idempotency-Key": "test-security-1"}
 
@@ -42,23 +29,78 @@ def test_security_keyword_routes_to_escalation():
     assert decision["risk_level"] == "high"
 
 
-def test_idempotency_same_key_returns_same_event_id():
-    payload = {
-        "event_type": "support_request",
-        "source": "api",
-        "actor": "test_user",
-        "payload": {"text": "VPN is down", "urgency": "high"},
-        "metadata": {},
-    }
+def test_idempotency_same_key_returns_same_event_id(make_ingest_payload):
+    # Idempotency lives in the pipeline, not the transport: call it directly.
+    req = IngestRequest.model_validate(make_ingest_payload())
+
+    r1 = asyncio.run(main._process_ingest(req, "test-idem-1"))
+    r2 = asyncio.run(main._process_ingest(req, "test-idem-1"))
+
+    assert r1.event.event_id == r2.event.event_id
+    # The duplicate replays the stored decision rather than deciding again
+    assert r1.decision == r2.decision
+
+
+def test_ingest_in_progress_key_returns_409(client, monkeypatch, make_ingest_payload):
+    # Simulate the first request for this key still running in this worker
+    monkeypatch.setattr(main, "_in_flight", {"test-in-progress-1"})
+
+    payload = make_ingest_payload()
+
+    headers = {"Idempotency-Key": "test-in-progress-1"}
+
+    response = client.post("/ingest/api", json=payload, headers=headers)
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["status"] == "in_progress"
+
+
+def test_ingest_key_claimed_by_other_worker_returns_409(client, idem_store, make_ingest_payload):
+    # Another worker stored the key and has not finished Decide/Act yet
+    other = Event(
+        event_id="other-worker-event",
+        event_type="support_request",
+        source="api",
+        timestamp="2026-01-01T00:00:00Z",
+        metadata={},
+    )
+    assert idem_store.claim("test-claimed-1", other).claimed
+
+    headers = {"Idempotency-Key": "test-claimed-1"}
 
-    headers = {"Idempotency-Key": "test-idem-1"}
+    response = client.post("/ingest/api", json=make_ingest_payload(), headers=headers)
 
-    r1 = client.post("/ingest/api", json=payload, headers=headers)
-    assert r1.status_code == 200
-    event_id_1 = r1.json()["event"]["event_id"]
+    assert response.status_code == 409
+    assert response.json()["detail"]["status"] == "in_progress"
 
-    r2 = client.post("/ingest/api", json=payload, headers=headers)
-    assert r2.status_code == 200
-    event_id_2 = r2.json()["event"]["event_id"]
+    # Once that worker gives up its claim, a retry takes over its Event
+    idem_store.release("test-claimed-1")
+    response = client.post("/ingest/api", json=make_ingest_payload(), headers=headers)
 
-    assert event_id_1 == event_id_2
+    assert response.status_code == 200
+    assert response.json()["event"]["event_id"] == "other-worker-event"
+
+
+def test_ingest_rejects_invalid_body(client):
+    headers = {"Idempotency-Key": "test-invalid-body-1"}
+
+    response = client.post("/ingest/api", json={"source": "api"}, headers=headers)
+
+    assert response.status_code == 422
+    locs = [tuple(err["loc"]) for err in response.json()["detail"]]
+    assert ("body", "event_type") in locs
+    assert ("body", "payload") in locs
+
+
+def test_ingest_event_matches_event_schema(client, make_ingest_payload):
+    # New events are built with Event.model_construct (no validation): catch schema drift.
+    payload = make_ingest_payload()
+
+    headers = {"Idempotency-Key": "test-schema-1"}
+
+    response = client.post("/ingest/api", json=payload, headers=headers)
+
+    assert response.status_code == 200
+    event = response.json()["event"]
+    assert set(event) == set(Event.model_fields)
+    Event.model_validate(event)
@@ -0,0 +1,59 @@
+import logging
+import queue
+
+import orjson
+
+import app.core.logging as app_logging
+
+
+class _CaptureHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_full_queue_drops_oldest_and_stop_still_returns(monkeypatch):
+    """
+    Overflow discards the oldest records, and stopping with a full queue must
+    not hang: the stop request is not a queue item drop-oldest could evict.
+    """
+    monkeypatch.setattr(app_logging, "_dropped_records", 0)
+    q = queue.Queue(maxsize=4)
+    handler = app_logging._DropOldestQueueHandler(q)
+    for i in range(10):
+        handler.emit(logging.makeLogRecord({"msg": f"r{i}", "levelno": logging.INFO}))
+
+    sink = _CaptureHandler()
+    listener = app_logging._EventLogListener(q, sink)
+    listener.start()
+    listener.stop()
+
+    assert [r.getMessage() for r in sink.records] == ["r6", "r7", "r8", "r9"]
+    assert app_logging.dropped_log_records() == 6
+
+
+def test_stop_reports_dropped_records(monkeypatch):
+    app_logging.start_log_listener()
+    monkeypatch.setattr(app_logging, "_dropped_records", 3)
+
+    app_logging.stop_log_listener()
+    app_logging.start_log_listener()
+
+    last = orjson.loads(app_logging.LOG_FILE_PATH.read_bytes().splitlines()[-1])
+    assert last["event"] == "log_records_dropped"
+    assert last["count"] == 3
+
+
+def test_append_reopens_rotated_log_file(tmp_path, monkeypatch):
+    log_path = tmp_path / "events.jsonl"
+    monkeypatch.setattr(app_logging, "LOG_FILE_PATH", log_path)
+
+    app_logging._append_jsonl(b'{"n":1}\n')
+    log_path.rename(tmp_path / "events.jsonl.1")
+    app_logging._append_jsonl(b'{"n":2}\n')
+
+    assert (tmp_path / "events.jsonl.1").read_bytes() == b'{"n":1}\n'
+    assert log_path.read_bytes() == b'{"n":2}\n'
@@ -0,0 +1,42 @@
+import pytest
+
+import app.core.auth as auth
+
+
+@pytest.fixture
+def ops_key(monkeypatch):
+    # Simulate a server started with OPS_API_KEY=test-ops-key
+    monkeypatch.setenv("OPS_API_KEY", "test-ops-key")
+    monkeypatch.setattr(auth, "_ops_api_key", None)
+    auth.load_ops_api_key()
+    return "test-ops-key"
+
+
+def test_ops_ping_requires_header(client, ops_key):
+    response = client.get("/ops/ping")
+
+    assert response.status_code == 403
+
+
+def test_ops_ping_rejects_wrong_key(client, ops_key):
+    response = client.get("/ops/ping", headers={"X-API-Key": "not-the-key"})
+
+    assert response.status_code == 403
+
+
+def test_ops_ping_accepts_configured_key(client, ops_key):
+    response = client.get("/ops/ping", headers={"X-API-Key": ops_key})
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_ops_ping_without_server_key_is_500(client, monkeypatch):
+    monkeypatch.delenv("OPS_API_KEY", raising=False)
+    monkeypatch.setattr(auth, "_ops_api_key", None)
+    auth.load_ops_api_key()
+
+    response = client.get("/ops/ping", headers={"X-API-Key": "anything"})
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "OPS_API_KEY not configured"